@@ -1,72 +1,135 @@
+import errno
+import heapq
+import itertools
 import logging
 import os
 import shutil
-from typing import List, Optional, Set, Tuple
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from operator import attrgetter
+from typing import AbstractSet, Dict, FrozenSet, Iterable, Iterator, List, Optional, Set, Tuple
 
+from .hash_cache import HashCache
 from .models import FlatFileItem
-from .utils import _calculate_short_sha256
+from .utils import DEFAULT_HASH_THREADS, HashAlgorithm, _calculate_short_hash
 
 logger = logging.getLogger(__name__)
 
+# Files below this size are hashed inline; handing them to the pool costs more than it saves.
+INLINE_HASH_MAX_SIZE = 64 * 1024
+
+# Names skipped while scanning: tool metadata and caches, not user files. They are skipped
+# whatever their type, since e.g. `.git` is a file in git worktrees and submodules.
+IGNORED_DIR_NAMES: FrozenSet[str] = frozenset({".git", "node_modules", "__pycache__"})
+
+# Identifies a file by (name or path, hash); tuples hash and compare without building strings.
+FileKey = Tuple[str, Optional[str]]
+
+# Item paths always use '/', so translation to the native separator is only needed on Windows.
+_NEED_SEP_XLATE = os.sep != "/"
+
 
 class DiskOperations:
     def __init__(self, root_dir: str):
         if not os.path.isdir(root_dir):
             raise ValueError(f"Root directory '{root_dir}' does not exist.")
         self.root_dir = root_dir
+        self.abs_root = os.path.abspath(root_dir)
         self.real_root = os.path.realpath(root_dir)
+        self._link_dirs: Dict[str, bool] = {}
+        self._root_prefix = os.path.join(root_dir, "")
         self.handled_paths: Set[str] = set()
 
-    def sync(self, current_items: List[FlatFileItem], desired_items: List[FlatFileItem]) -> None:
-        """Apply changes to match the desired file structure while ignoring file deletes."""
+    def sync(
+        self, current_items: List[FlatFileItem], desired_items: List[FlatFileItem]
+    ) -> List[FlatFileItem]:
+        """
+        Apply changes to match the desired file structure while ignoring file deletes.
+
+        Returns the resulting structure in `create_snapshot` form, derived from the operations
+        that were applied instead of rescanning the tree. Skipped moves leave their file where
+        it was, and file contents are never changed, so moved files keep their hash and size.
+        """
 
         missing, added = self.compare_structures(current_items, desired_items)
-        self._create_directories(added)
-        self._move_files_by_hash(missing, added)
-        self._delete_empty_dirs(missing)
+        created = self._create_directories(added)
+        moved = self._move_files_by_hash(missing, added)
+        removed = self._delete_empty_dirs(missing)
+        return _structure_after_sync(current_items, created, moved, removed)
 
-    def _create_directories(self, added: List[FlatFileItem]) -> None:
+    def _create_directories(self, added: List[FlatFileItem]) -> List[str]:
+        created: List[str] = []
         for item in added:
-            if item.path.endswith("/"):
+            if item.is_dir:
                 full_path = self._to_abs(item.path)
                 if not self._is_safe(full_path):
                     logger.info("Skipping directory creation for %s (outside root)", item.path)
                     continue
-                if not os.path.exists(full_path):
-                    logger.info("Creating directory: %s", full_path)
-                    try:
-                        os.makedirs(full_path, exist_ok=True)
-                    except (NotADirectoryError, FileExistsError) as e:
-                        logger.error("Creating directory: %s", e)
-                        continue
+                try:
+                    os.makedirs(full_path, exist_ok=True)
+                except (NotADirectoryError, FileExistsError) as e:
+                    logger.error("Creating directory: %s", e)
+                    continue
+                logger.info("Ensured directory: %s", full_path)
                 self.handled_paths.add(item.path)
+                created.append(item.path)
+        return created
 
-    def _move_files_by_hash(self, missing: List[FlatFileItem], added: List[FlatFileItem]) -> None:
-        src_by_hash = {i.hash: i for i in missing if not i.path.endswith("/") and i.hash}
-        dst_by_hash = {i.hash: i for i in added if not i.path.endswith("/") and i.hash}
+    def _move_files_by_hash(
+        self, missing: List[FlatFileItem], added: List[FlatFileItem]
+    ) -> Dict[str, str]:
+        """Moves files to their desired location and returns the applied moves as {src: dst}."""
+        moved: Dict[str, str] = {}
+        src_by_hash = {i.hash: i for i in missing if not i.is_dir and i.hash}
+        dst_by_hash = {i.hash: i for i in added if not i.is_dir and i.hash}
 
+        # Follows `missing` order (sorted by path) so the moves run in a deterministic order.
+        pending: List[Tuple[FlatFileItem, FlatFileItem]] = []
         for file_hash, src_item in src_by_hash.items():
-            if file_hash not in dst_by_hash:
+            dst_item = dst_by_hash.get(file_hash)
+            if dst_item is None:
                 continue
-
-            dst_item = dst_by_hash[file_hash]
-            src = self._to_abs(src_item.path)
-            dst = self._to_abs(dst_item.path)
-
-            if not self._is_safe(src) or not self._is_safe(dst):
+            if not self._is_safe(self._to_abs(src_item.path)) or not self._is_safe(
+                self._to_abs(dst_item.path)
+            ):
                 logger.info(
                     "Skipping move from '%s' to '%s' (outside root).", src_item.path, dst_item.path
                 )
                 continue
+            pending.append((src_item, dst_item))
+
+        # A destination may only be vacated by a later move in a chain, so blocked moves are
+        # retried until a pass makes no progress; only cycles such as swaps stay blocked.
+        while pending:
+            blocked: List[Tuple[FlatFileItem, FlatFileItem]] = []
+            for src_item, dst_item in pending:
+                src = self._to_abs(src_item.path)
+                dst = self._to_abs(dst_item.path)
+                # os.replace would silently overwrite whatever is still there.
+                if os.path.lexists(dst) and not _is_case_rename(src, dst):
+                    blocked.append((src_item, dst_item))
+                    continue
+
+                os.makedirs(os.path.dirname(dst), exist_ok=True)
+                logger.info("Moving file: %s -> %s", src, dst)
+                _move_file(src, dst)
+                self.handled_paths.update({src_item.path, dst_item.path})
+                moved[src_item.path] = dst_item.path
+            if len(blocked) == len(pending):
+                break
+            pending = blocked
 
-            os.makedirs(os.path.dirname(dst), exist_ok=True)
-            logger.info("Moving file: %s -> %s", src, dst)
-            shutil.move(src, dst)
-            self.handled_paths.update({src_item.path, dst_item.path})
+        for src_item, dst_item in pending:
+            logger.info(
+                "Skipping move from '%s' to '%s' (destination exists).",
+                src_item.path,
+                dst_item.path,
+            )
+        return moved
 
     def _delete_missing_files(self, missing: List[FlatFileItem]) -> None:
         for item in missing:
-            if item.path in self.handled_paths or item.path.endswith("/"):
+            if item.path in self.handled_paths or item.is_dir:
                 continue
 
             full = self._to_abs(item.path)
@@ -74,93 +137,315 @@ class DiskOperations:
                 logger.info("Skipping delete of '%s'", item.path)
                 continue
 
-            if os.path.exists(full):
-                logger.info("Deleting file: %s", full)
+            try:
                 os.remove(full)
-                self.handled_paths.add(item.path)
+            except FileNotFoundError:
+                continue
+            logger.info("Deleted file: %s", full)
+            self.handled_paths.add(item.path)
 
-    def _delete_empty_dirs(self, missing: List[FlatFileItem]) -> None:
-        dirs = set()
+    def _delete_empty_dirs(self, missing: List[FlatFileItem]) -> Set[str]:
+        """Removes directories left empty by `missing` and returns them, without trailing '/'."""
+        removed: Set[str] = set()
+        seen: Set[str] = set()
+        deepest_first: List[Tuple[int, str]] = []
         for item in missing:
-            path = item.path
-            current = path.strip("/") if path.endswith("/") else os.path.dirname(path)
-            while current:
-                dirs.add(current)
-                parent = os.path.dirname(current)
-                if parent == current:
-                    break
-                current = parent
-
-        for dir_path in sorted(dirs, key=lambda p: p.replace("\\", "/").count("/"), reverse=True):
+            current = item.path.strip("/") if item.is_dir else item.path.rpartition("/")[0]
+            # Once a directory has been seen, all of its ancestors have been too.
+            while current and current not in seen:
+                seen.add(current)
+                deepest_first.append((-current.count("/"), current))
+                current = current.rpartition("/")[0]
+
+        heapq.heapify(deepest_first)
+        while deepest_first:
+            _, dir_path = heapq.heappop(deepest_first)
             full = self._to_abs(dir_path)
             if not self._is_safe(full):
                 logger.info("Skipping rmdir '%s' (outside root).", dir_path)
                 continue
-            if os.path.isdir(full):
-                try:
-                    os.rmdir(full)
-                    logger.info("Removed empty dir: %s", full)
-                except OSError:
-                    pass
+            try:
+                os.rmdir(full)
+                logger.info("Removed empty dir: %s", full)
+                removed.add(dir_path)
+            except OSError:
+                pass
+        return removed
 
     def _to_abs(self, rel_path: str) -> str:
-        return os.path.join(self.root_dir, rel_path.replace("/", os.sep))
+        if _NEED_SEP_XLATE:
+            return os.path.join(self.root_dir, rel_path.replace("/", os.sep))
+        # Same result as os.path.join: an absolute path replaces the root.
+        if rel_path.startswith("/"):
+            return rel_path
+        return self._root_prefix + rel_path
 
     def _is_safe(self, path: str) -> bool:
-        return os.path.realpath(path).startswith(self.real_root)
+        if os.pardir in path.split(os.sep):
+            # abspath would collapse "link/.." textually, while the kernel follows the link
+            # first, so only the fully resolved path can be trusted here.
+            return _is_within(os.path.realpath(path), self.real_root)
+        abs_path = os.path.abspath(path)
+        if not _is_within(abs_path, self.abs_root):
+            return False
+        # A lexically contained path can only escape the root through a symlink below it.
+        if self._traverses_link(abs_path):
+            return _is_within(os.path.realpath(path), self.real_root)
+        return True
+
+    def _traverses_link(self, abs_path: str) -> bool:
+        """Checks whether any component of `abs_path` below the root is a symlink."""
+        rel_path = abs_path[len(self.abs_root) :].strip(os.sep)
+        if not rel_path:
+            return False
+        *parents, _ = rel_path.split(os.sep)
+        current = self.abs_root
+        for part in parents:
+            current = os.path.join(current, part)
+            is_link = self._link_dirs.get(current)
+            if is_link is None:
+                is_link = self._link_dirs[current] = os.path.islink(current)
+            if is_link:
+                return True
+        return os.path.islink(abs_path)
 
     @staticmethod
-    def create_snapshot(root_dir: str) -> Optional[List[FlatFileItem]]:
-        """Creates a flat list of all files and empty directories."""
+    def create_snapshot(
+        root_dir: str,
+        max_workers: Optional[int] = None,
+        hash_algorithm: HashAlgorithm = HashAlgorithm.XXH3,
+        hash_cache: Optional[HashCache] = None,
+        ignore: AbstractSet[str] = IGNORED_DIR_NAMES,
+    ) -> Optional[List[FlatFileItem]]:
+        """
+        Creates a flat list of all files and empty directories. Entries named in `ignore`
+        are skipped, along with everything inside them when they are directories.
+
+        Only files that share their size with another file are content-hashed; a file with a
+        unique size is already told apart by its size, so it gets a `size-<bytes>` marker
+        instead. Larger files are hashed concurrently on up to `max_workers` threads. With a
+        `hash_cache`, files unchanged since they were last hashed reuse their cached hash.
+        """
         if not os.path.isdir(root_dir):
             logger.error("Error: Directory '%s' does not exist.", root_dir)
             return None
 
+        scan_started_ns = time.time_ns()
         items: List[FlatFileItem] = []
-        for dirpath, dirnames, filenames in os.walk(root_dir):
-            if not filenames and not dirnames:
-                rel_path = os.path.relpath(dirpath, root_dir)
-                if rel_path != ".":
-                    items.append(FlatFileItem(path=rel_path.replace(os.sep, "/") + "/"))
-
-            for filename in filenames:
-                full_path = os.path.join(dirpath, filename)
-                rel_path = os.path.relpath(full_path, root_dir)
-                items.append(
-                    FlatFileItem(
-                        path=rel_path.replace(os.sep, "/"),
-                        hash=_calculate_short_sha256(full_path),
-                        size=os.path.getsize(full_path),
+        computed: List[Tuple[os.stat_result, str, str]] = []
+        hashing: List[Tuple[str, os.stat_result, Future[str]]] = []
+        # Files whose size has been seen only once so far; hashed only if another file matches.
+        first_of_size: Dict[int, Tuple[str, str, os.stat_result]] = {}
+        shared_sizes: Set[int] = set()
+
+        # Large files are handed to the pool as soon as their size turns out to be shared, so
+        # they are hashed while the rest of the tree is still being walked.
+        with ThreadPoolExecutor(max_workers=max_workers or DEFAULT_HASH_THREADS) as executor:
+
+            def add_hashed(rel_path: str, full_path: str, st: os.stat_result) -> None:
+                size = st.st_size
+                file_hash = hash_cache.get(st, hash_algorithm) if hash_cache is not None else None
+                if file_hash is None and size >= INLINE_HASH_MAX_SIZE:
+                    future = executor.submit(
+                        _calculate_short_hash, full_path, 12, size, hash_algorithm
                     )
-                )
-        return sorted(items, key=lambda x: x.path)
+                    hashing.append((rel_path, st, future))
+                    return
+                if file_hash is None:
+                    file_hash = _calculate_short_hash(
+                        full_path, size=size, algorithm=hash_algorithm
+                    )
+                    computed.append((st, hash_algorithm, file_hash))
+                items.append(FlatFileItem(path=rel_path, hash=file_hash, size=size))
+
+            for rel_path, full_path, st in _scan(root_dir, ignore):
+                if st is None:
+                    items.append(FlatFileItem(path=rel_path))
+                elif st.st_size in shared_sizes:
+                    add_hashed(rel_path, full_path, st)
+                elif st.st_size in first_of_size:
+                    shared_sizes.add(st.st_size)
+                    add_hashed(*first_of_size.pop(st.st_size))
+                    add_hashed(rel_path, full_path, st)
+                else:
+                    first_of_size[st.st_size] = (rel_path, full_path, st)
+
+            for rel_path, st, future in hashing:
+                file_hash = future.result()
+                items.append(FlatFileItem(path=rel_path, hash=file_hash, size=st.st_size))
+                computed.append((st, hash_algorithm, file_hash))
+
+        for rel_path, _, st in first_of_size.values():
+            size = st.st_size
+            items.append(FlatFileItem(path=rel_path, hash=f"size-{size}", size=size))
+
+        if hash_cache is not None:
+            hash_cache.set_many(computed, scan_started_ns)
+
+        items.sort(key=attrgetter("path"))
+        return items
 
     @staticmethod
     def compare_structures(
-        current_items: List[FlatFileItem],
-        desired_items: List[FlatFileItem],
+        current_items: Iterable[FlatFileItem],
+        desired_items: Iterable[FlatFileItem],
         files_only: bool = False,
     ) -> Tuple[List[FlatFileItem], List[FlatFileItem]]:
-        def item_key(item: FlatFileItem) -> str:
-            if files_only and not item.path.endswith("/"):
-                filename = os.path.basename(item.path)
-                return f"{filename}::{item.hash}"
-            return item.path if item.path.endswith("/") else f"{item.path}::{item.hash}"
-
-        current_map = {
-            item_key(item): item
-            for item in current_items
-            if not files_only or not item.path.endswith("/")
-        }
-        desired_map = {
-            item_key(item): item
-            for item in desired_items
-            if not files_only or not item.path.endswith("/")
-        }
-
-        missing_keys = current_map.keys() - desired_map.keys()
-        added_keys = desired_map.keys() - current_map.keys()
-
-        missing = sorted([current_map[k] for k in missing_keys], key=lambda x: x.path)
-        added = sorted([desired_map[k] for k in added_keys], key=lambda x: x.path)
+        """
+        Returns (missing, added): items only in `current_items` and items only in
+        `desired_items`, sorted by path. Each input is consumed in a single pass, so any
+        iterable of items works, not just lists.
+        """
+        current_files, current_dirs = _split_items(current_items)
+        desired_files, desired_dirs = _split_items(desired_items)
+
+        if files_only:
+            current_map = {_file_key(i): i for i in current_files}
+            desired_map = {_file_key(i): i for i in desired_files}
+        else:
+            current_map = {(i.path, i.hash): i for i in current_files}
+            desired_map = {(i.path, i.hash): i for i in desired_files}
+        missing = [current_map[k] for k in current_map.keys() - desired_map.keys()]
+        added = [desired_map[k] for k in desired_map.keys() - current_map.keys()]
+
+        if not files_only:
+            current_dir_map = {i.path: i for i in current_dirs}
+            desired_dir_map = {i.path: i for i in desired_dirs}
+            missing.extend(
+                current_dir_map[k] for k in current_dir_map.keys() - desired_dir_map.keys()
+            )
+            added.extend(
+                desired_dir_map[k] for k in desired_dir_map.keys() - current_dir_map.keys()
+            )
+
+        by_path = attrgetter("path")
+        missing.sort(key=by_path)
+        added.sort(key=by_path)
         return missing, added
+
+    @staticmethod
+    def compare_counts(
+        current_keys: FrozenSet[FileKey], desired_keys: FrozenSet[FileKey]
+    ) -> Tuple[int, int]:
+        """
+        Returns (missing, added) counts between two key sets from `file_keys`, without building
+        the difference lists that `compare_structures` returns.
+        """
+        if current_keys == desired_keys:
+            return 0, 0
+        return len(current_keys - desired_keys), len(desired_keys - current_keys)
+
+    @staticmethod
+    def file_keys(items: Iterable[FlatFileItem]) -> FrozenSet[FileKey]:
+        """
+        Returns the set of files in `items` identified by name and content, ignoring folders.
+        Two structures hold the same files exactly when their keys are equal; this is the
+        comparison `compare_structures(..., files_only=True)` performs.
+        """
+        return frozenset(_file_key(i) for i in items if not i.is_dir)
+
+
+def _split_items(items: Iterable[FlatFileItem]) -> Tuple[List[FlatFileItem], List[FlatFileItem]]:
+    """Splits items into (files, directories)."""
+    files: List[FlatFileItem] = []
+    dirs: List[FlatFileItem] = []
+    for item in items:
+        (dirs if item.is_dir else files).append(item)
+    return files, dirs
+
+
+def _file_key(item: FlatFileItem) -> FileKey:
+    # Item paths are always '/'-separated, so a partition is enough to take the file name.
+    return item.path.rpartition("/")[2], item.hash
+
+
+def _structure_after_sync(
+    current_items: List[FlatFileItem],
+    created: List[str],
+    moved: Dict[str, str],
+    removed: Set[str],
+) -> List[FlatFileItem]:
+    """Applies the operations performed by `sync` to `current_items`."""
+    files: List[FlatFileItem] = []
+    dir_paths: Set[str] = set(created)
+    for item in current_items:
+        if item.is_dir:
+            dir_paths.add(item.path)
+        elif item.path in moved:
+            files.append(FlatFileItem(path=moved[item.path], hash=item.hash, size=item.size))
+        else:
+            files.append(item)
+    dir_paths = {p for p in dir_paths if p.strip("/") not in removed}
+
+    # Like create_snapshot, only report folders that contain nothing else.
+    non_empty: Set[str] = set()
+    for path in itertools.chain((f.path for f in files), dir_paths):
+        parent = path.rstrip("/").rpartition("/")[0]
+        while parent and parent + "/" not in non_empty:
+            non_empty.add(parent + "/")
+            parent = parent.rpartition("/")[0]
+
+    items = files + [FlatFileItem(path=p) for p in dir_paths if p not in non_empty]
+    items.sort(key=attrgetter("path"))
+    return items
+
+
+def _is_within(path: str, root: str) -> bool:
+    return path == root or path.startswith(os.path.join(root, ""))
+
+
+def _is_case_rename(src: str, dst: str) -> bool:
+    """
+    Checks whether `dst` only differs from `src` in case and names the same file, as it does on
+    case-insensitive filesystems (macOS, Windows), so renaming onto it can't lose another file.
+    """
+    if src.lower() != dst.lower():
+        return False
+    try:
+        return os.path.samestat(os.lstat(src), os.lstat(dst))
+    except OSError:
+        return False
+
+
+def _move_file(src: str, dst: str) -> None:
+    """
+    Renames `src` to `dst`, copying only when they are on different filesystems. An existing
+    `dst` is replaced, so callers check for it first.
+    """
+    try:
+        os.replace(src, dst)
+    except OSError as e:
+        if e.errno != errno.EXDEV:
+            raise
+        shutil.move(src, dst)
+
+
+def _scan(
+    root_dir: str, ignore: AbstractSet[str] = frozenset()
+) -> Iterator[Tuple[str, str, Optional[os.stat_result]]]:
+    """
+    Walks `root_dir` with os.scandir, yielding (relative path, full path, stat) tuples.
+    Empty directories are yielded with a trailing '/' and a stat of None. Entries whose name
+    is in `ignore` are skipped, whether they are files or directories.
+    """
+    stack = [(root_dir, "")]
+    while stack:
+        dir_path, rel_prefix = stack.pop()
+        is_empty = True
+        try:
+            entries = os.scandir(dir_path)
+        except OSError as e:
+            # Like os.walk, skip directories that can't be listed instead of failing the scan.
+            logger.warning("Skipping unreadable directory '%s': %s", dir_path, e)
+            continue
+        with entries:
+            for entry in entries:
+                is_empty = False
+                if entry.name in ignore:
+                    continue
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append((entry.path, rel_prefix + entry.name + "/"))
+                elif entry.is_file():
+                    yield rel_prefix + entry.name, entry.path, entry.stat()
+        if is_empty and rel_prefix:
+            yield rel_prefix, dir_path, None
@@ -0,0 +1,120 @@
+import logging
+import os
+import sqlite3
+import time
+from typing import Iterable, List, Optional, Tuple
+
+from .utils import default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Entries not seen by a snapshot for this long are deleted when the cache is opened.
+DEFAULT_MAX_AGE_SECONDS = 30 * 24 * 60 * 60
+
+# Files modified this close to the start of a scan aren't cached: a same-size rewrite within
+# the same mtime tick would otherwise be served the old hash (git's "racy clean" problem).
+RACY_WINDOW_NS = 2 * 10**9
+
+# Bumped whenever the table layout changes; older tables are dropped, since they only cache.
+_SCHEMA_VERSION = 1
+
+_Key = Tuple[int, int, int, int, str]
+
+
+def default_cache_path() -> str:
+    return os.path.join(default_cache_dir(), "hash_cache.sqlite3")
+
+
+class HashCache:
+    """
+    On-disk cache of file content hashes, keyed by (device, inode, mtime, size, algorithm).
+
+    A file whose inode, size and modification time are unchanged since it was last hashed is
+    assumed to have the same contents, so repeat snapshots of an unchanged tree skip hashing.
+    """
+
+    def __init__(
+        self, path: Optional[str] = None, max_age_seconds: float = DEFAULT_MAX_AGE_SECONDS
+    ):
+        self.path = path if path is not None else default_cache_path()
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        # Keys of cache hits since the last set_many, whose last_seen is refreshed with it.
+        self._hits: List[_Key] = []
+        with self._conn:
+            if self._conn.execute("PRAGMA user_version").fetchone()[0] != _SCHEMA_VERSION:
+                self._conn.execute("DROP TABLE IF EXISTS hashes")
+                self._conn.execute(f"PRAGMA user_version = {_SCHEMA_VERSION}")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS hashes ("
+                "dev INTEGER NOT NULL, ino INTEGER NOT NULL, mtime_ns INTEGER NOT NULL, "
+                "size INTEGER NOT NULL, algorithm TEXT NOT NULL, hash TEXT NOT NULL, "
+                "last_seen REAL NOT NULL, "
+                "PRIMARY KEY (dev, ino, mtime_ns, size, algorithm))"
+            )
+            pruned = self._conn.execute(
+                "DELETE FROM hashes WHERE last_seen < ?", (time.time() - max_age_seconds,)
+            ).rowcount
+        if pruned:
+            logger.info("Pruned %d stale file hashes", pruned)
+
+    def get(self, st: os.stat_result, algorithm: str) -> Optional[str]:
+        key = _key(st, algorithm)
+        if key is None:
+            return None
+        row = self._conn.execute(
+            "SELECT hash FROM hashes "
+            "WHERE dev = ? AND ino = ? AND mtime_ns = ? AND size = ? AND algorithm = ?",
+            key,
+        ).fetchone()
+        if row is None:
+            return None
+        self._hits.append(key)
+        return row[0]
+
+    def set_many(
+        self,
+        entries: Iterable[Tuple[os.stat_result, str, str]],
+        scan_started_ns: Optional[int] = None,
+    ) -> None:
+        """
+        Stores (stat, algorithm, hash) entries and refreshes the hits since the last call, in a
+        single transaction. With `scan_started_ns`, files modified within RACY_WINDOW_NS of it
+        (or later) are left out, since their mtime can't yet tell a rewrite apart.
+        """
+        now = time.time()
+        racy_after = None if scan_started_ns is None else scan_started_ns - RACY_WINDOW_NS
+        rows = []
+        for st, algorithm, file_hash in entries:
+            if racy_after is not None and st.st_mtime_ns >= racy_after:
+                continue
+            key = _key(st, algorithm)
+            if key is not None:
+                rows.append((*key, file_hash, now))
+        hits, self._hits = self._hits, []
+        if not rows and not hits:
+            return
+        with self._conn:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO hashes "
+                "(dev, ino, mtime_ns, size, algorithm, hash, last_seen) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.executemany(
+                "UPDATE hashes SET last_seen = ? "
+                "WHERE dev = ? AND ino = ? AND mtime_ns = ? AND size = ? AND algorithm = ?",
+                ((now, *key) for key in hits),
+            )
+        logger.info("Cached %d file hashes", len(rows))
+
+    def close(self) -> None:
+        self._conn.close()
+
+
+def _key(st: os.stat_result, algorithm: str) -> Optional[_Key]:
+    # Without a real inode number (e.g. some Windows scandir results) files can't be told apart.
+    if not st.st_ino:
+        return None
+    return st.st_dev, st.st_ino, st.st_mtime_ns, st.st_size, algorithm
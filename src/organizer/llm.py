@@ -1,50 +1,206 @@
-import json
-from typing import List, Union
+import asyncio
+import logging
+from typing import Any, Dict, List, Optional, Sequence, Set, Tuple, Union
 
-from litellm import CustomStreamWrapper, completion
+import httpx
+import litellm
+from litellm import CustomStreamWrapper, acompletion, completion
+from litellm.llms.base_llm.base_utils import type_to_response_format_param
 from litellm.types.utils import ModelResponse, StreamingChoices
+from pydantic import TypeAdapter, ValidationError
 
-from organizer.models import FlatFileItem, LLMResponseSchema
+from organizer.llm_cache import LLMCache
+from organizer.models import FlatFileItem, LLMResponseSchema, OrganizationStrategy
 
+logger = logging.getLogger(__name__)
 
-class IntelligentFileOrganizer:
-    def __init__(self, model: str = "gemini/gemini-2.5-flash"):
-        self.model = model
-        self.system_prompt = """
-        You are an expert file system organizer. Your task is to analyze the provided directory structure and propose up to three distinct, logical, and practical reorganization plans. Each plan should aim to improve clarity, accessibility, and reduce clutter.
+# Total per-request timeout for litellm calls, which only accept a number.
+REQUEST_TIMEOUT_SECONDS = 60.0
+# The shared sessions also bound the connect phase.
+_SESSION_TIMEOUT = httpx.Timeout(REQUEST_TIMEOUT_SECONDS, connect=10.0)
+_HTTP_LIMITS = httpx.Limits(max_connections=None, max_keepalive_connections=32)
+
+# Serialises the structure in a single pass in pydantic-core, as compact JSON in field order.
+_STRUCTURE_ADAPTER = TypeAdapter(List[FlatFileItem])
+
+# Upper bound on LLM requests in flight when several models are queried at once.
+MAX_CONCURRENT_REQUESTS = 8
+
+# Built once; passing the model class makes litellm regenerate its JSON schema on every call.
+RESPONSE_FORMAT = type_to_response_format_param(LLMResponseSchema)
+
+SYSTEM_PROMPT = """
+You are an expert file system organizer. Your task is to analyze the provided directory structure and propose up to three distinct, logical, and practical reorganization plans. Each plan should aim to improve clarity, accessibility, and reduce clutter.
+
+For each proposed plan, you must output a JSON object that adheres strictly to the defined `response_schema`.
+
+Your proposed plans could provide suggestions that:
+* **Group similar file types** (e.g., all `.csv` files, all `.xml` files).
+* **Consolidate files related to the same project or client**
+* **Reduce unnecessary nested subfolders.**
+* **You are encouraged to rename folders to improve organization but do not rename files.**
 
-        For each proposed plan, you must output a JSON object that adheres strictly to the defined `response_schema`.
+Present your suggestions as a JSON array, where each element is one of your proposed organization strategy JSON object.
+""".strip()
 
-        Your proposed plans could provide suggestions that:
-        * **Group similar file types** (e.g., all `.csv` files, all `.xml` files).
-        * **Consolidate files related to the same project or client**
-        * **Reduce unnecessary nested subfolders.**
-        * **You are encouraged to rename folders to improve organization but do not rename files.**
+# Static and sent first in every request, so providers can reuse it as a cached prompt prefix.
+SYSTEM_MESSAGE = {"role": "system", "content": SYSTEM_PROMPT}
 
+# Providers whose models accept an explicit `cache_control` marker on the system prompt.
+_CACHE_CONTROL_PREFIXES = ("anthropic/",)
+_CACHED_SYSTEM_MESSAGE: Dict[str, Any] = {
+    "role": "system",
+    "content": [
+        {"type": "text", "text": SYSTEM_PROMPT, "cache_control": {"type": "ephemeral"}},
+    ],
+}
 
-        Present your suggestions as a JSON array, where each element is one of your proposed organization strategy JSON object.
-            """
+
+def configure_http_clients() -> None:
+    """
+    Installs keep-alive HTTP clients as litellm's shared sessions, unless some are already set.
+    litellm's OpenAI-compatible handlers reuse them across requests; other providers keep
+    their own pooled clients. Called once at CLI start up, since the sessions are process-wide.
+    """
+    if litellm.client_session is None:
+        litellm.client_session = httpx.Client(limits=_HTTP_LIMITS, timeout=_SESSION_TIMEOUT)
+    if litellm.aclient_session is None:
+        litellm.aclient_session = httpx.AsyncClient(limits=_HTTP_LIMITS, timeout=_SESSION_TIMEOUT)
+
+
+class IntelligentFileOrganizer:
+    def __init__(
+        self,
+        model: str = "gemini/gemini-2.5-flash",
+        cache: Optional[LLMCache] = None,
+        extra_models: Sequence[str] = (),
+        cache_system_prompt: bool = True,
+    ):
+        self.model = model
+        self.cache = cache
+        self.extra_models = list(extra_models)
+        self.cache_system_prompt = cache_system_prompt
+        # Responses fetched since the last store/discard, keyed by cache key. They are only
+        # cached once the caller accepts them, so a rejected plan isn't replayed on the next run.
+        self._unsaved_responses: Dict[str, str] = {}
 
     def generate_reorganization_strategies(
         self, current_structure: List[FlatFileItem]
     ) -> LLMResponseSchema:
-        current_structure_json = json.dumps(
-            [item.model_dump() for item in current_structure], indent=2
-        )
+        """
+        Asks the model for reorganization strategies. When extra models are configured, all
+        models are queried concurrently and their strategies are merged.
+        """
+        messages = self._build_messages(current_structure)
+        if not self.extra_models:
+            return self._complete(self.model, messages)
+        return asyncio.run(self._agenerate(messages))
+
+    def store_responses(self) -> None:
+        """Caches the responses behind the last generated strategies, once they are accepted."""
+        if self.cache is not None:
+            for cache_key, content in self._unsaved_responses.items():
+                self.cache.set(cache_key, content)
+        self._unsaved_responses.clear()
+
+    def discard_responses(self) -> None:
+        """Drops the responses behind rejected strategies, so the next run asks again."""
+        self._unsaved_responses.clear()
+
+    def _build_messages(self, current_structure: List[FlatFileItem]) -> List[Dict[str, str]]:
+        current_structure_json = _STRUCTURE_ADAPTER.dump_json(
+            current_structure, exclude_none=True
+        ).decode()
+        return [
+            SYSTEM_MESSAGE,
+            {
+                "role": "user",
+                "content": f"Here is the current file structure in JSON:\n{current_structure_json}",
+            },
+        ]
+
+    def _complete(self, model: str, messages: List[Dict[str, str]]) -> LLMResponseSchema:
+        cache_key, cached = self._lookup(model, messages)
+        if cached is not None:
+            return cached
 
         response: Union[ModelResponse, CustomStreamWrapper] = completion(
-            model=self.model,
-            response_format=LLMResponseSchema,
-            messages=[
-                {"role": "system", "content": self.system_prompt},
-                {
-                    "role": "user",
-                    "content": f"Here is the current file structure in JSON:\n{current_structure_json}",
-                },
-            ],
+            model=model,
+            response_format=RESPONSE_FORMAT,
+            messages=self._provider_messages(model, messages),
+            temperature=0.0,
+            timeout=REQUEST_TIMEOUT_SECONDS,
+        )
+        return self._parse(response, cache_key)
+
+    async def _acomplete(self, model: str, messages: List[Dict[str, str]]) -> LLMResponseSchema:
+        cache_key, cached = self._lookup(model, messages)
+        if cached is not None:
+            return cached
+
+        response = await acompletion(
+            model=model,
+            response_format=RESPONSE_FORMAT,
+            messages=self._provider_messages(model, messages),
             temperature=0.0,
+            timeout=REQUEST_TIMEOUT_SECONDS,
         )
+        return self._parse(response, cache_key)
+
+    async def _agenerate(self, messages: List[Dict[str, str]]) -> LLMResponseSchema:
+        models = [self.model, *self.extra_models]
+        semaphore = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+
+        async def bounded(model: str) -> LLMResponseSchema:
+            async with semaphore:
+                return await self._acomplete(model, messages)
+
+        results = await asyncio.gather(
+            *(bounded(model) for model in models), return_exceptions=True
+        )
+
+        strategies: List[OrganizationStrategy] = []
+        seen_names: Set[str] = set()
+        errors: List[BaseException] = []
+        for model, result in zip(models, results):
+            if isinstance(result, BaseException):
+                logger.error("Generating strategies with %s failed: %s", model, result)
+                errors.append(result)
+                continue
+            for strategy in result.strategies:
+                if strategy.name not in seen_names:
+                    seen_names.add(strategy.name)
+                    strategies.append(strategy)
+
+        if len(errors) == len(models):
+            raise errors[0]
+        return LLMResponseSchema(strategies=strategies)
+
+    def _provider_messages(
+        self, model: str, messages: List[Dict[str, str]]
+    ) -> List[Dict[str, Any]]:
+        """Marks the system prompt as cacheable for providers that need an explicit hint."""
+        if not self.cache_system_prompt or not model.startswith(_CACHE_CONTROL_PREFIXES):
+            return list(messages)
+        return [_CACHED_SYSTEM_MESSAGE, *messages[1:]]
+
+    def _lookup(
+        self, model: str, messages: List[Dict[str, str]]
+    ) -> Tuple[Optional[str], Optional[LLMResponseSchema]]:
+        if self.cache is None:
+            return None, None
+        cache_key = LLMCache.make_key(model, messages, RESPONSE_FORMAT)
+        cached = self.cache.get(cache_key)
+        if cached is None:
+            return cache_key, None
+        try:
+            return cache_key, LLMResponseSchema.model_validate_json(cached)
+        except ValidationError as e:
+            # The refetched response replaces the entry once it is stored.
+            logger.warning("Ignoring cached LLM response that no longer validates: %s", e)
+            return cache_key, None
 
+    def _parse(self, response: Any, cache_key: Optional[str]) -> LLMResponseSchema:
         if isinstance(response, CustomStreamWrapper):
             raise TypeError("Expected Non-Streaming response but got streaming response")
 
@@ -55,4 +211,7 @@ class IntelligentFileOrganizer:
         if content is None:
             raise ValueError("LLM response content is None")
 
-        return LLMResponseSchema.model_validate_json(content)
+        parsed = LLMResponseSchema.model_validate_json(content)
+        if cache_key is not None:
+            self._unsaved_responses[cache_key] = content
+        return parsed
@@ -0,0 +1,73 @@
+import hashlib
+import json
+import logging
+import os
+import sqlite3
+import time
+from typing import Any, Optional
+
+from .utils import default_cache_dir
+
+logger = logging.getLogger(__name__)
+
+# Cached responses older than this are ignored, and deleted when the cache is opened.
+DEFAULT_TTL_SECONDS = 7 * 24 * 60 * 60
+
+
+def default_cache_path() -> str:
+    return os.path.join(default_cache_dir(), "llm_cache.sqlite3")
+
+
+class LLMCache:
+    """
+    On-disk cache of raw LLM response strings, keyed by a sha256 of the request.
+
+    Only deterministic (temperature 0) requests should be cached, since a hit replays the
+    exact response that was stored for the same model and messages.
+    """
+
+    def __init__(self, path: Optional[str] = None, ttl_seconds: float = DEFAULT_TTL_SECONDS):
+        self.path = path if path is not None else default_cache_path()
+        self.ttl_seconds = ttl_seconds
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._conn = sqlite3.connect(self.path)
+        with self._conn:
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS responses "
+                "(key TEXT PRIMARY KEY, content TEXT NOT NULL, created_at REAL NOT NULL)"
+            )
+            pruned = self._conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - ttl_seconds,)
+            ).rowcount
+        if pruned:
+            logger.info("Pruned %d expired LLM responses", pruned)
+
+    @staticmethod
+    def make_key(model: str, messages: Any, response_format: Any = None) -> str:
+        payload = json.dumps(
+            [model, messages, response_format], sort_keys=True, separators=(",", ":")
+        )
+        return hashlib.sha256(payload.encode()).hexdigest()
+
+    def get(self, key: str) -> Optional[str]:
+        row = self._conn.execute(
+            "SELECT content, created_at FROM responses WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return None
+        content, created_at = row
+        if time.time() - created_at > self.ttl_seconds:
+            logger.info("LLM cache entry expired: %s", key)
+            return None
+        logger.info("LLM cache hit: %s", key)
+        return content
+
+    def set(self, key: str, content: str) -> None:
+        with self._conn:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO responses (key, content, created_at) VALUES (?, ?, ?)",
+                (key, content, time.time()),
+            )
+
+    def close(self) -> None:
+        self._conn.close()
@@ -1,11 +1,19 @@
 import logging.config
 import sys
+from typing import Optional
+
+# Level applied by the last setup_logger call, so repeat calls don't rebuild the handlers.
+_configured_level: Optional[str] = None
 
 
 def setup_logger(log_level="INFO"):
     """
     Sets up the logging configuration for the entire application.
+    Calling it again with the level already in effect is a no-op.
     """
+    global _configured_level
+    if _configured_level == log_level:
+        return
 
     LOGGING_CONFIG = {
         "version": 1,
@@ -31,4 +39,5 @@ def setup_logger(log_level="INFO"):
         },
     }
     logging.config.dictConfig(LOGGING_CONFIG)
-    logging.getLogger(__name__).info(f"Logging configured with base level: {log_level}")
+    _configured_level = log_level
+    logging.getLogger(__name__).info("Logging configured with base level: %s", log_level)
@@ -1,18 +1,31 @@
 import logging
+import sqlite3
+from typing import Callable, List, Optional, TypeVar
 
 import typer
 from dotenv import load_dotenv
 from typing_extensions import Annotated
 
-from .llm import IntelligentFileOrganizer
 from .logging_config import setup_logger
-from .organizer import Organizer
+from .utils import HashAlgorithm
 
-load_dotenv()
 app = typer.Typer()
 
 logger = logging.getLogger(__name__)
 
+T = TypeVar("T")
+
+
+def _open_cache(factory: Callable[[], T], name: str) -> Optional[T]:
+    """Opens a cache, running without it when its file can't be created (e.g. read-only HOME)."""
+    try:
+        return factory()
+    except (OSError, sqlite3.Error) as e:
+        typer.secho(
+            f"Warning: running without the {name} cache: {e}", fg=typer.colors.YELLOW, err=True
+        )
+        return None
+
 
 @app.command()
 def organize(
@@ -23,21 +36,63 @@ def organize(
             help="llm model to use for generating options eg. gemini/gemini-2.5-flash, gemini/gemini-2.0-flash"
         ),
     ] = "gemini/gemini-2.5-flash",
+    extra_model: Annotated[
+        Optional[List[str]],
+        typer.Option(
+            help="Additional llm model queried concurrently with --llm-model; can be repeated"
+        ),
+    ] = None,
     show_logs: Annotated[bool, typer.Option(help="Enable/Disable logs")] = False,
+    max_concurrency: Annotated[
+        Optional[int],
+        typer.Option(help="Maximum number of threads used to hash files", min=1),
+    ] = None,
+    hash_algorithm: Annotated[
+        HashAlgorithm,
+        typer.Option(
+            help="Algorithm used to fingerprint file contents", envvar="ORGANIZER_HASH_ALGO"
+        ),
+    ] = HashAlgorithm.XXH3,
+    cache: Annotated[
+        bool,
+        typer.Option(help="Reuse cached file hashes and llm responses for unchanged files"),
+    ] = True,
 ) -> None:
     if show_logs:
         setup_logger()
 
     logger.info("Starting organizer under path: %s", path)
 
+    # Imported here so that --help and argument errors don't pay for loading litellm.
+    from .hash_cache import HashCache
+    from .llm import IntelligentFileOrganizer, configure_http_clients
+    from .llm_cache import LLMCache
+    from .organizer import Organizer
+
+    load_dotenv()
+    configure_http_clients()
+
+    llm_cache = _open_cache(LLMCache, "llm response") if cache else None
+    hash_cache = _open_cache(HashCache, "file hash") if cache else None
     try:
-        llm = IntelligentFileOrganizer(llm_model)
-        organizer = Organizer(path, llm_client=llm)
+        llm = IntelligentFileOrganizer(llm_model, cache=llm_cache, extra_models=extra_model or ())
+        organizer = Organizer(
+            path,
+            llm_client=llm,
+            max_concurrency=max_concurrency,
+            hash_algorithm=hash_algorithm,
+            hash_cache=hash_cache,
+        )
         organizer.organize()
     except Exception as e:
         logger.error("Error organizing files: %s", e)
         typer.secho(f"Error organizing files: {e}", fg=typer.colors.RED, err=True)
         raise typer.Exit(1)
+    finally:
+        if llm_cache is not None:
+            llm_cache.close()
+        if hash_cache is not None:
+            hash_cache.close()
 
 
 if __name__ == "__main__":
@@ -1,26 +1,39 @@
 from typing import List, Optional
 
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, ConfigDict, Field
 
 
 class FlatFileItem(BaseModel):
+    # Frozen: items are never modified after creation, and this makes them hashable.
+    model_config = ConfigDict(defer_build=True, frozen=True)
+
     path: str = Field(
         description="Full path of the file or folder. Folders end with '/', files do not. "
         "Example: 'src/utils/math.go' (file), 'src/utils/' (folder)"
     )
     hash: Optional[str] = Field(
         default=None,
-        description="Hash of file contents. Present only for files.",
+        description="Identifier of the file contents: a content hash, or 'size-<bytes>' when "
+        "no other file has the same size. Present only for files.",
     )
     size: Optional[int] = Field(
         default=None, description="Size of the file in bytes. Present only for files."
     )
 
+    @property
+    def is_dir(self) -> bool:
+        """Whether this item is a folder, i.e. its path ends with '/'."""
+        return self.path.endswith("/")
+
 
 class OrganizationStrategy(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     name: str = Field(description="The organization strategy used for the items, e.g., 'by_name'.")
     items: List[FlatFileItem]
 
 
 class LLMResponseSchema(BaseModel):
+    model_config = ConfigDict(defer_build=True)
+
     strategies: List[OrganizationStrategy]
@@ -1,12 +1,17 @@
 import logging
-from typing import List
+from typing import TYPE_CHECKING, List
 
 import typer
 
 from .disk_operations import DiskOperations
-from .llm import IntelligentFileOrganizer
+from .hash_cache import HashCache
 from .models import FlatFileItem, LLMResponseSchema, OrganizationStrategy
 from .renderer import ConsoleRenderer, render_progress_task
+from .utils import HashAlgorithm
+
+if TYPE_CHECKING:
+    # Only needed for annotations; importing it at runtime would pull in litellm.
+    from .llm import IntelligentFileOrganizer
 
 logger = logging.getLogger(__name__)
 
@@ -15,10 +20,16 @@ class Organizer:
     def __init__(
         self,
         root_path: str,
-        llm_client: IntelligentFileOrganizer,
+        llm_client: "IntelligentFileOrganizer",
         renderer: ConsoleRenderer | None = None,
+        max_concurrency: int | None = None,
+        hash_algorithm: HashAlgorithm = HashAlgorithm.XXH3,
+        hash_cache: HashCache | None = None,
     ):
         self.root_path = root_path
+        self.max_concurrency = max_concurrency
+        self.hash_algorithm = hash_algorithm
+        self.hash_cache = hash_cache
         self.llm_client = llm_client
         self.disk_ops = DiskOperations(root_path)
         self.renderer = renderer if renderer is not None else ConsoleRenderer()
@@ -34,13 +45,13 @@ class Organizer:
         proposed_structures: List[OrganizationStrategy],
     ) -> bool:
         all_valid = True
+        current_keys = DiskOperations.file_keys(current_structure)
         for strategy in proposed_structures:
-            missing, added = DiskOperations.compare_structures(
-                current_structure, strategy.items, files_only=True
-            )
-            if len(missing) > 0 or len(added) > 0:
+            proposed_keys = DiskOperations.file_keys(strategy.items)
+            missing, added = DiskOperations.compare_counts(current_keys, proposed_keys)
+            if missing or added:
                 typer.echo(
-                    f"Files added/removed from proposed strategy, skipping. Added: {len(added)} Removed: {len(missing)}"
+                    f"Files added/removed from proposed strategy, skipping. Added: {added} Removed: {missing}"
                 )
                 all_valid = False
         return all_valid
@@ -49,12 +60,15 @@ class Organizer:
         self,
         current_structure: List[FlatFileItem],
         proposed_structure: List[FlatFileItem],
-    ) -> None:
-        self.disk_ops.sync(current_structure, proposed_structure)
+    ) -> List[FlatFileItem]:
+        return self.disk_ops.sync(current_structure, proposed_structure)
 
     def organize(self) -> None:
         current_structure: List[FlatFileItem] | None = DiskOperations.create_snapshot(
-            self.root_path
+            self.root_path,
+            max_workers=self.max_concurrency,
+            hash_algorithm=self.hash_algorithm,
+            hash_cache=self.hash_cache,
         )
         if current_structure:
             self.renderer.render_file_tree(current_structure)
@@ -64,13 +78,16 @@ class Organizer:
 
         parsed_response = self.generate_options(current_structure)
         if self.validate_options(current_structure, parsed_response.strategies):
+            self.llm_client.store_responses()
             self.renderer.render_organization_strategy(parsed_response.strategies)
         else:
+            self.llm_client.discard_responses()
             return
 
         option = self.renderer.render_strategy_selection(parsed_response.strategies)
-        self.apply_strategy(current_structure, parsed_response.strategies[option].items)
+        current_structure = self.apply_strategy(
+            current_structure, parsed_response.strategies[option].items
+        )
 
-        current_structure = DiskOperations.create_snapshot(self.root_path)
         if current_structure:
             self.renderer.render_file_tree(current_structure)
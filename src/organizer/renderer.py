@@ -1,6 +1,6 @@
 import os
-from functools import wraps
-from typing import Any, Callable, Dict, List
+from functools import lru_cache, wraps
+from typing import Callable, List, Set, Tuple
 
 import typer
 from rich.console import Console
@@ -10,10 +10,19 @@ from rich.tree import Tree
 
 from .models import FlatFileItem, OrganizationStrategy
 
+# Shared so terminal detection runs once rather than for every renderer and progress spinner.
+CONSOLE = Console()
+
+
+@lru_cache(maxsize=4096)
+def _label(is_dir: bool, name: str) -> str:
+    """Tree node label; cached since folder names tend to repeat across and within trees."""
+    return f"{'📁' if is_dir else '📄'} {name}"
+
 
 class ConsoleRenderer:
     def __init__(self):
-        self.console = Console()
+        self.console = CONSOLE
 
     def generate_file_tree(self, items: List[FlatFileItem]) -> Tree:
         if not items:
@@ -26,32 +35,34 @@ class ConsoleRenderer:
         else:
             prefix = ""
 
-        root_label = f"📁 {prefix.strip('/') or '.'}"
-        tree = Tree(root_label)
-        fs_tree: Dict[str, Any] = {}
+        tree = Tree(_label(True, prefix.strip("/") or "."))
 
+        prefix_len = len(prefix)
+        entries: Set[Tuple[Tuple[str, ...], bool]] = set()
         for item in items:
-            rel_path = os.path.relpath(item.path, prefix) if prefix else item.path
-            parts = [p for p in rel_path.strip("/").split("/") if p]
-            current = fs_tree
-            for part in parts[:-1]:
-                current = current.setdefault(part, {})
-            final = parts[-1]
-            if item.path.endswith("/"):
-                current.setdefault(final, {})
-            else:
-                current[final] = item
-
-        def build_tree(parent: Tree, node: Any, label: str) -> None:
-            if isinstance(node, dict):
-                folder = parent.add(f"📁 {label}" if label else "📁")
-                for key in sorted(node):
-                    build_tree(folder, node[key], key)
-            else:
-                parent.add(f"📄 {label}")
-
-        for key in sorted(fs_tree):
-            build_tree(tree, fs_tree[key], key)
+            # Paths are '/'-separated and all start with `prefix`, so slicing it off is enough.
+            parts = tuple(p for p in item.path[prefix_len:].split("/") if p)
+            if parts:
+                entries.add((parts, item.is_dir))
+
+        # Sorting by path parts visits every folder right before its contents, in name order, so
+        # the tree can be built in one pass while keeping only the currently open folders.
+        open_parts: List[str] = []
+        open_nodes: List[Tree] = [tree]
+        for parts, is_dir in sorted(entries):
+            folder_parts = parts if is_dir else parts[:-1]
+            common = 0
+            for open_part, part in zip(open_parts, folder_parts):
+                if open_part != part:
+                    break
+                common += 1
+            del open_parts[common:]
+            del open_nodes[common + 1 :]
+            for part in folder_parts[common:]:
+                open_parts.append(part)
+                open_nodes.append(open_nodes[-1].add(_label(True, part)))
+            if not is_dir:
+                open_nodes[-1].add(_label(False, parts[-1]))
 
         return tree
 
@@ -108,6 +119,7 @@ def render_progress_task(description: str) -> Callable:
             with Progress(
                 SpinnerColumn(),
                 TextColumn("[progress.description]{task.description}"),
+                console=CONSOLE,
                 transient=True,
             ) as progress:
                 task_id = progress.add_task(description=description, total=None)
@@ -1,13 +1,95 @@
 import hashlib
+import mmap
+import os
+import threading
+from enum import Enum
+from typing import Any, Callable, Dict, Optional
+
+import xxhash
+
+
+class HashAlgorithm(str, Enum):
+    """Algorithms available for snapshot content hashes."""
+
+    XXH3 = "xxh3"
+    SHA256 = "sha256"
+    # Slowest of the three; only for comparing against existing MD5 checksums.
+    MD5 = "md5"
+
+
+_HASH_FACTORIES: Dict[HashAlgorithm, Callable[[], Any]] = {
+    HashAlgorithm.XXH3: xxhash.xxh3_128,
+    HashAlgorithm.SHA256: hashlib.sha256,
+    HashAlgorithm.MD5: hashlib.md5,
+}
+
+# Default thread count for hashing; threads mostly wait on I/O or run with the GIL released.
+DEFAULT_HASH_THREADS = min(32, (os.cpu_count() or 1) * 4)
+
+# Read size for files that aren't memory-mapped.
+READ_CHUNK_SIZE = 1024 * 1024
+
+# Files at least this large are memory-mapped and hashed in a single update call.
+MMAP_MIN_SIZE = 32 * 1024 * 1024
+
+# Per-thread read buffer, reused across every file a hashing thread reads.
+_read_buffers = threading.local()
+
+
+def default_cache_dir() -> str:
+    """Directory for the organizer's on-disk caches, following the XDG base directory spec."""
+    cache_home = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(cache_home, "organizer")
+
+
+def _file_digest(
+    file_path: str, hash_factory: Callable[[], Any], size: Optional[int] = None
+) -> bytes:
+    """
+    Hashes a file with a fresh hash object from `hash_factory` and returns the raw digest.
+    `size` may be passed when the caller already knows it, saving an fstat on the open file.
+    """
+    with open(file_path, "rb", buffering=0) as f:
+        if size is None:
+            size = os.fstat(f.fileno()).st_size
+        if size >= MMAP_MIN_SIZE:
+            try:
+                mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            except (OSError, ValueError):
+                # Some filesystems (e.g. FUSE mounts) can't be mapped; read them instead.
+                pass
+            else:
+                with mm:
+                    if hasattr(mmap, "MADV_SEQUENTIAL"):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    hasher = hash_factory()
+                    hasher.update(mm)
+                return hasher.digest()
+        if size > READ_CHUNK_SIZE and hasattr(os, "posix_fadvise"):
+            os.posix_fadvise(f.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        hasher = hash_factory()
+        view = _read_buffer()
+        while n := f.readinto(view):
+            hasher.update(view[:n])
+        return hasher.digest()
+
+
+def _read_buffer() -> memoryview:
+    """Returns this thread's READ_CHUNK_SIZE read buffer, allocating it on first use."""
+    view: Optional[memoryview] = getattr(_read_buffers, "view", None)
+    if view is None or len(view) != READ_CHUNK_SIZE:
+        view = _read_buffers.view = memoryview(bytearray(READ_CHUNK_SIZE))
+    return view
+
+
+def _short_hex(digest: bytes, length: int) -> str:
+    # Only hex-encode the bytes that survive truncation rather than the whole digest.
+    return digest[: (length + 1) // 2].hex()[:length]
 
 
 def _calculate_md5(file_path: str) -> str:
     """Calculates the MD5 hash of a file."""
-    hash_md5 = hashlib.md5()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            hash_md5.update(chunk)
-    return hash_md5.hexdigest()
+    return _file_digest(file_path, hashlib.md5).hex()
 
 
 def _calculate_short_sha256(file_path: str, length: int = 12) -> str:
@@ -15,8 +97,19 @@ def _calculate_short_sha256(file_path: str, length: int = 12) -> str:
     Calculates a short SHA-256 hash of a file.
     Default length is 12 hex chars (~48 bits), customizable via `length`.
     """
-    sha = hashlib.sha256()
-    with open(file_path, "rb") as f:
-        for chunk in iter(lambda: f.read(4096), b""):
-            sha.update(chunk)
-    return sha.hexdigest()[:length]
+    return _short_hex(_file_digest(file_path, hashlib.sha256), length)
+
+
+def _calculate_short_hash(
+    file_path: str,
+    length: int = 12,
+    size: Optional[int] = None,
+    algorithm: HashAlgorithm = HashAlgorithm.XXH3,
+) -> str:
+    """
+    Calculates a short hash of a file, used as its content identity. The default XXH3-128 is
+    non-cryptographic; identity checks only need it to tell different contents apart.
+    Default length is 12 hex chars (~48 bits), customizable via `length`. Pass `size` when it
+    is already known from a directory scan to skip re-stating the file.
+    """
+    return _short_hex(_file_digest(file_path, _HASH_FACTORIES[algorithm], size), length)
@@ -0,0 +1,33 @@
+from dataclasses import dataclass
+from typing import Callable, List
+
+import pytest
+
+from organizer.models import LLMResponseSchema
+
+
+@dataclass
+class FakeMessage:
+    content: str
+
+
+@dataclass
+class FakeChoice:
+    message: FakeMessage
+
+
+@dataclass
+class FakeResponse:
+    """The subset of a litellm ModelResponse that IntelligentFileOrganizer reads."""
+
+    choices: List[FakeChoice]
+
+
+@pytest.fixture
+def fake_response() -> Callable[[LLMResponseSchema], FakeResponse]:
+    """Builds a completion response whose content is `response` serialised as JSON."""
+
+    def build(response: LLMResponseSchema) -> FakeResponse:
+        return FakeResponse(choices=[FakeChoice(message=FakeMessage(response.model_dump_json()))])
+
+    return build
@@ -34,6 +34,8 @@ def create_themed_test_files_with_nesting(
         seed (int): Seed for the random number generator to ensure reproducible results.
     """
     random.seed(seed)
+    # Separate generator for file contents, so names and layout for a seed stay the same.
+    content_rng = random.Random(seed)
 
     if themes is None:
         themes = [
@@ -122,7 +124,8 @@ def create_themed_test_files_with_nesting(
             # Write dummy content to the file
             try:
                 with open(file_path, "wb") as f:  # 'wb' for binary write
-                    f.write(os.urandom(file_size_bytes))  # Write random bytes
+                    # Dummy data needs no CSPRNG; randbytes is much faster than os.urandom.
+                    f.write(content_rng.randbytes(file_size_bytes))
                 created_files_list.append(file_path)
                 # print(f"Created: {file_path} ({file_size_bytes / 1024:.2f} KB)")
             except IOError as e:
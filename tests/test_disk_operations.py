@@ -1,10 +1,13 @@
+import errno
+import hashlib
 import os
 from typing import List
 
 import pytest
 
+import organizer.disk_operations as disk_operations
 from organizer.disk_operations import DiskOperations, FlatFileItem
-from organizer.utils import _calculate_short_sha256
+from organizer.utils import HashAlgorithm, _calculate_short_hash
 
 
 def create_dummy_file(filepath: str, content: str) -> None:
@@ -40,6 +43,96 @@ def test_create_snapshot_valid(temp_dir_structure):
     assert "subdir2/" in paths
 
 
+def test_create_snapshot_hashes_large_files_concurrently(tmp_path):
+    root_dir = tmp_path / "root"
+    os.makedirs(root_dir)
+    for i in range(4):
+        (root_dir / f"large_{i}.bin").write_bytes(bytes([i]) * (256 * 1024))
+
+    items = DiskOperations.create_snapshot(str(root_dir), max_workers=2)
+    assert items is not None
+    assert [item.path for item in items] == [f"large_{i}.bin" for i in range(4)]
+    for item in items:
+        assert item.hash == _calculate_short_hash(str(root_dir / item.path))
+        assert item.size == 256 * 1024
+
+
+@pytest.mark.parametrize(
+    "algorithm, reference",
+    [(HashAlgorithm.SHA256, hashlib.sha256), (HashAlgorithm.MD5, hashlib.md5)],
+)
+def test_create_snapshot_uses_selected_hash_algorithm(tmp_path, algorithm, reference):
+    root_dir = tmp_path / "root"
+    create_dummy_file(root_dir / "same_a.txt", "aaaa")
+    create_dummy_file(root_dir / "same_b.txt", "bbbb")
+
+    items = DiskOperations.create_snapshot(str(root_dir), hash_algorithm=algorithm)
+    assert items is not None
+    assert [item.hash for item in items] == [
+        reference(b"aaaa").hexdigest()[:12],
+        reference(b"bbbb").hexdigest()[:12],
+    ]
+
+
+def test_create_snapshot_hashes_only_shared_sizes(tmp_path):
+    root_dir = tmp_path / "root"
+    create_dummy_file(root_dir / "unique.txt", "unique size")
+    create_dummy_file(root_dir / "same_a.txt", "aaaa")
+    create_dummy_file(root_dir / "same_b.txt", "bbbb")
+
+    items = DiskOperations.create_snapshot(str(root_dir))
+    assert items is not None
+    hashes = {item.path: item.hash for item in items}
+    assert hashes["unique.txt"] == f"size-{len('unique size')}"
+    assert hashes["same_a.txt"] == _calculate_short_hash(str(root_dir / "same_a.txt"))
+    assert hashes["same_b.txt"] == _calculate_short_hash(str(root_dir / "same_b.txt"))
+
+
+def test_create_snapshot_skips_ignored_dirs(tmp_path):
+    root_dir = tmp_path / "root"
+    create_dummy_file(root_dir / "main.py", "print()")
+    create_dummy_file(root_dir / ".git" / "HEAD", "ref")
+    create_dummy_file(root_dir / "pkg" / "__pycache__" / "main.pyc", "bytecode")
+    os.makedirs(root_dir / "node_modules" / "empty")
+    # Git worktrees and submodules have a `.git` file pointing at the real git directory.
+    create_dummy_file(root_dir / "sub" / ".git", "gitdir: ../.git/modules/sub")
+    create_dummy_file(root_dir / "sub" / "lib.py", "pass")
+
+    items = DiskOperations.create_snapshot(str(root_dir))
+    assert items is not None
+    assert [item.path for item in items] == ["main.py", "sub/lib.py"]
+
+    items = DiskOperations.create_snapshot(str(root_dir), ignore=frozenset())
+    assert items is not None
+    assert [item.path for item in items] == [
+        ".git/HEAD",
+        "main.py",
+        "node_modules/empty/",
+        "pkg/__pycache__/main.pyc",
+        "sub/.git",
+        "sub/lib.py",
+    ]
+
+
+def test_create_snapshot_skips_unreadable_dirs(tmp_path, monkeypatch):
+    root_dir = tmp_path / "root"
+    create_dummy_file(root_dir / "ok" / "f", "ok")
+    create_dummy_file(root_dir / "denied" / "g", "hidden")
+
+    real_scandir = os.scandir
+
+    def scandir(path):
+        if os.path.basename(path) == "denied":
+            raise PermissionError(errno.EACCES, "Permission denied", path)
+        return real_scandir(path)
+
+    monkeypatch.setattr(disk_operations.os, "scandir", scandir)
+
+    items = DiskOperations.create_snapshot(str(root_dir))
+    assert items is not None
+    assert [item.path for item in items] == ["ok/f"]
+
+
 def test_create_snapshot_non_existent():
     assert DiskOperations.create_snapshot("non_existent_dir") is None
 
@@ -74,6 +167,20 @@ def test_compare_structures_with_changes():
     assert added == [FlatFileItem(path="file2.txt", hash="h2", size=20)]
 
 
+def test_compare_structures_accepts_iterators():
+    current = [
+        FlatFileItem(path="file1.txt", hash="h1", size=10),
+        FlatFileItem(path="dir1/"),
+    ]
+    desired = [FlatFileItem(path="file2.txt", hash="h2", size=20)]
+    missing, added = DiskOperations.compare_structures(iter(current), (i for i in desired))
+    assert missing == [
+        FlatFileItem(path="dir1/"),
+        FlatFileItem(path="file1.txt", hash="h1", size=10),
+    ]
+    assert added == desired
+
+
 def test_compare_same_filename_different_hash():
     current = [FlatFileItem(path="file.txt", hash="h1", size=10)]
     desired = [FlatFileItem(path="file.txt", hash="h2", size=10)]
@@ -99,6 +206,21 @@ def test_compare_files_only_mode():
     assert added == [FlatFileItem(path="y/new.txt", hash="h_new", size=10)]
 
 
+def test_file_keys_ignore_folders_and_location():
+    current = [
+        FlatFileItem(path="a/b/c/file.txt", hash="h1", size=10),
+        FlatFileItem(path="empty_dir/"),
+    ]
+    moved = [
+        FlatFileItem(path="x/"),
+        FlatFileItem(path="x/file.txt", hash="h1", size=10),
+    ]
+    changed = [FlatFileItem(path="x/file.txt", hash="h2", size=10)]
+
+    assert DiskOperations.file_keys(current) == DiskOperations.file_keys(moved)
+    assert DiskOperations.file_keys(current) != DiskOperations.file_keys(changed)
+
+
 def test_compare_multiple_files_same_name_different_hash():
     current = [
         FlatFileItem(path="a/file.txt", hash="h1", size=10),
@@ -127,7 +249,7 @@ def test_apply_changes_integration(tmp_path):
     current_items = DiskOperations.create_snapshot(str(root_dir))
     assert current_items is not None
 
-    move_hash = _calculate_short_sha256(str(root_dir / "a" / "move_me.txt"))
+    move_hash = next(i.hash for i in current_items if i.path == "a/move_me.txt")
 
     desired_items = [
         FlatFileItem(path="b/moved.txt", hash=move_hash, size=len("content")),
@@ -135,7 +257,7 @@ def test_apply_changes_integration(tmp_path):
     ]
 
     syncer = DiskOperations(str(root_dir))
-    syncer.sync(current_items, desired_items)
+    result = syncer.sync(current_items, desired_items)
 
     assert (root_dir / "delete_me.txt").exists()
     assert not (root_dir / "a" / "move_me.txt").exists()
@@ -147,6 +269,131 @@ def test_apply_changes_integration(tmp_path):
     moved_file = root_dir / "b" / "moved.txt"
     assert moved_file.exists()
     assert moved_file.read_text() == "content"
+    assert result == DiskOperations.create_snapshot(str(root_dir))
+
+
+def test_move_does_not_overwrite_existing_file(tmp_path):
+    root_dir = tmp_path / "sync_root"
+    create_dummy_file(root_dir / "a" / "f.txt", "one")
+    create_dummy_file(root_dir / "b" / "f.txt", "two")
+
+    current_items = DiskOperations.create_snapshot(str(root_dir))
+    assert current_items is not None
+    move_hash = next(i.hash for i in current_items if i.path == "a/f.txt")
+
+    desired_items = [FlatFileItem(path="b/f.txt", hash=move_hash, size=3)]
+    DiskOperations(str(root_dir)).sync(current_items, desired_items)
+
+    assert (root_dir / "a" / "f.txt").read_text() == "one"
+    assert (root_dir / "b" / "f.txt").read_text() == "two"
+
+
+def test_case_only_rename_on_case_insensitive_filesystem(tmp_path, monkeypatch):
+    root_dir = tmp_path / "sync_root"
+    create_dummy_file(root_dir / "Docs" / "Readme.md", "readme")
+    src = str(root_dir / "Docs" / "Readme.md")
+    dst = str(root_dir / "docs" / "readme.md")
+
+    current_items = [FlatFileItem(path="Docs/Readme.md", hash="h1", size=6)]
+    desired_items = [FlatFileItem(path="docs/readme.md", hash="h1", size=6)]
+
+    # Make the destination resolve to the source, as a case-insensitive filesystem would.
+    real_lexists, real_lstat = os.path.lexists, os.lstat
+    monkeypatch.setattr(os.path, "lexists", lambda p: p == dst or real_lexists(p))
+    monkeypatch.setattr(os, "lstat", lambda p: real_lstat(src if p == dst else p))
+
+    DiskOperations(str(root_dir)).sync(current_items, desired_items)
+    monkeypatch.undo()
+
+    assert not os.path.exists(src)
+    assert (root_dir / "docs" / "readme.md").read_text() == "readme"
+
+
+def test_move_falls_back_to_copy_across_filesystems(tmp_path, monkeypatch):
+    root_dir = tmp_path / "sync_root"
+    create_dummy_file(root_dir / "a" / "move_me.txt", "content")
+
+    current_items = DiskOperations.create_snapshot(str(root_dir))
+    assert current_items is not None
+    move_hash = next(i.hash for i in current_items if i.path == "a/move_me.txt")
+
+    def cross_device(src, dst):
+        raise OSError(errno.EXDEV, "Invalid cross-device link")
+
+    monkeypatch.setattr(disk_operations.os, "replace", cross_device)
+
+    desired_items = [FlatFileItem(path="b/moved.txt", hash=move_hash, size=len("content"))]
+    DiskOperations(str(root_dir)).sync(current_items, desired_items)
+
+    assert not (root_dir / "a" / "move_me.txt").exists()
+    assert (root_dir / "b" / "moved.txt").read_text() == "content"
+
+
+def test_sync_result_matches_rescan_when_moving_into_empty_dir(tmp_path):
+    root_dir = tmp_path / "sync_root"
+    create_dummy_file(root_dir / "a" / "move_me.txt", "content")
+    create_dummy_file(root_dir / "a" / "stay.txt", "stays")
+    os.makedirs(root_dir / "empty")
+    os.makedirs(root_dir / "untouched")
+
+    current_items = DiskOperations.create_snapshot(str(root_dir))
+    assert current_items is not None
+    move_hash = next(i.hash for i in current_items if i.path == "a/move_me.txt")
+
+    desired_items = [
+        FlatFileItem(path="empty/move_me.txt", hash=move_hash, size=len("content")),
+        FlatFileItem(path="new/deep/"),
+        FlatFileItem(path="untouched/"),
+    ]
+
+    result = DiskOperations(str(root_dir)).sync(current_items, desired_items)
+
+    assert result == DiskOperations.create_snapshot(str(root_dir))
+
+
+def test_sync_applies_chained_moves_onto_occupied_paths(tmp_path):
+    root_dir = tmp_path / "sync_root"
+    create_dummy_file(root_dir / "a" / "f.txt", "one")
+    create_dummy_file(root_dir / "c" / "f.txt", "two")
+
+    current_items = DiskOperations.create_snapshot(str(root_dir))
+    assert current_items is not None
+    hashes = {i.path: i.hash for i in current_items}
+
+    # a/f.txt is sorted first, but c/f.txt has to be moved away before it can take its place.
+    desired_items = [
+        FlatFileItem(path="c/f.txt", hash=hashes["a/f.txt"], size=3),
+        FlatFileItem(path="n/f.txt", hash=hashes["c/f.txt"], size=3),
+    ]
+
+    result = DiskOperations(str(root_dir)).sync(current_items, desired_items)
+
+    assert (root_dir / "c" / "f.txt").read_text() == "one"
+    assert (root_dir / "n" / "f.txt").read_text() == "two"
+    assert not (root_dir / "a").exists()
+    assert result == DiskOperations.create_snapshot(str(root_dir))
+    assert [i.path for i in result] == ["c/f.txt", "n/f.txt"]
+
+
+def test_sync_leaves_swapped_files_in_place(tmp_path):
+    root_dir = tmp_path / "sync_root"
+    create_dummy_file(root_dir / "a.txt", "one")
+    create_dummy_file(root_dir / "b.txt", "two")
+
+    current_items = DiskOperations.create_snapshot(str(root_dir))
+    assert current_items is not None
+    hashes = {i.path: i.hash for i in current_items}
+
+    desired_items = [
+        FlatFileItem(path="a.txt", hash=hashes["b.txt"], size=3),
+        FlatFileItem(path="b.txt", hash=hashes["a.txt"], size=3),
+    ]
+
+    result = DiskOperations(str(root_dir)).sync(current_items, desired_items)
+
+    assert (root_dir / "a.txt").read_text() == "one"
+    assert (root_dir / "b.txt").read_text() == "two"
+    assert result == current_items
 
 
 def test_apply_changes_does_not_affect_outside_directory(tmp_path):
@@ -171,7 +418,7 @@ def test_move_skipped_when_destination_outside_root(tmp_path):
     os.makedirs(root_dir)
     malicious_path = "../outside.txt"
     create_dummy_file(root_dir / "move_me.txt", "data")
-    hash_val = _calculate_short_sha256(str(root_dir / "move_me.txt"))
+    hash_val = _calculate_short_hash(str(root_dir / "move_me.txt"))
 
     current_items = [
         FlatFileItem(path=os.path.join(root_dir, "move_me.txt"), hash=hash_val, size=4)
@@ -188,14 +435,68 @@ def test_move_skipped_when_destination_outside_root(tmp_path):
     assert not (tmp_path / "outside.txt").exists()
 
 
+def test_move_skipped_when_destination_in_sibling_with_shared_prefix(tmp_path):
+    root_dir = tmp_path / "root"
+    os.makedirs(root_dir)
+    os.makedirs(tmp_path / "root_sibling")
+    create_dummy_file(root_dir / "move_me.txt", "data")
+    hash_val = _calculate_short_hash(str(root_dir / "move_me.txt"))
+
+    current_items = [FlatFileItem(path="move_me.txt", hash=hash_val, size=4)]
+    desired_items = [FlatFileItem(path="../root_sibling/move_me.txt", hash=hash_val, size=4)]
+
+    syncer = DiskOperations(str(root_dir))
+    syncer.sync(current_items, desired_items)
+
+    assert (root_dir / "move_me.txt").exists()
+    assert not (tmp_path / "root_sibling" / "move_me.txt").exists()
+
+
+def test_move_skipped_when_destination_traverses_symlink_outside_root(tmp_path):
+    root_dir = tmp_path / "root"
+    outside_dir = tmp_path / "outside"
+    os.makedirs(root_dir)
+    os.makedirs(outside_dir)
+    os.symlink(outside_dir, root_dir / "link")
+    create_dummy_file(root_dir / "move_me.txt", "data")
+
+    current_items = [FlatFileItem(path="move_me.txt", hash="h1", size=4)]
+    desired_items = [FlatFileItem(path="link/move_me.txt", hash="h1", size=4)]
+
+    syncer = DiskOperations(str(root_dir))
+    syncer.sync(current_items, desired_items)
+
+    assert (root_dir / "move_me.txt").exists()
+    assert not (outside_dir / "move_me.txt").exists()
+
+
+def test_move_skipped_when_destination_climbs_out_of_symlink(tmp_path):
+    root_dir = tmp_path / "root"
+    outside_dir = tmp_path / "outside"
+    os.makedirs(root_dir)
+    os.makedirs(outside_dir / "inner")
+    os.symlink(outside_dir / "inner", root_dir / "link")
+    create_dummy_file(root_dir / "move_me2.txt", "data")
+
+    # The kernel resolves "link" before applying "..", which lands in outside/, not root/.
+    current_items = [FlatFileItem(path="move_me2.txt", hash="h1", size=4)]
+    desired_items = [FlatFileItem(path="link/../move_me2.txt", hash="h1", size=4)]
+
+    syncer = DiskOperations(str(root_dir))
+    syncer.sync(current_items, desired_items)
+
+    assert (root_dir / "move_me2.txt").exists()
+    assert not (outside_dir / "move_me2.txt").exists()
+
+
 def test_partial_structure_move(tmp_path):
     root_dir = tmp_path / "root"
     os.makedirs(root_dir)
     create_dummy_file(root_dir / "a" / "b" / "c" / "d.txt", "deep")
 
-    hash_val = _calculate_short_sha256(str(root_dir / "a" / "b" / "c" / "d.txt"))
     current_items = DiskOperations.create_snapshot(str(root_dir))
     assert current_items is not None
+    hash_val = current_items[0].hash
 
     desired_items = [
         FlatFileItem(path="x/y/z/d.txt", hash=hash_val, size=len("deep")),
@@ -245,7 +546,7 @@ def test_ignored_non_matching_hash_move(tmp_path):
     os.makedirs(root_dir)
     create_dummy_file(root_dir / "original.txt", "original content")
 
-    hash_actual = _calculate_short_sha256(str(root_dir / "original.txt"))
+    hash_actual = _calculate_short_hash(str(root_dir / "original.txt"))
     hash_fake = "deadbeef"  # Mismatched hash
 
     current_items = [FlatFileItem(path="original.txt", hash=hash_actual, size=17)]
@@ -257,3 +558,22 @@ def test_ignored_non_matching_hash_move(tmp_path):
     # File should not be moved since hashes don't match
     assert (root_dir / "original.txt").exists()
     assert not (root_dir / "new_place.txt").exists()
+
+
+def test_compare_counts():
+    current = DiskOperations.file_keys(
+        [
+            FlatFileItem(path="a/file.txt", hash="h1", size=10),
+            FlatFileItem(path="b/stale.txt", hash="h2", size=20),
+        ]
+    )
+    desired = DiskOperations.file_keys(
+        [
+            FlatFileItem(path="c/file.txt", hash="h1", size=10),
+            FlatFileItem(path="c/new.txt", hash="h3", size=30),
+            FlatFileItem(path="c/other.txt", hash="h4", size=40),
+        ]
+    )
+
+    assert DiskOperations.compare_counts(current, current) == (0, 0)
+    assert DiskOperations.compare_counts(current, desired) == (1, 2)
@@ -0,0 +1,113 @@
+import os
+import sqlite3
+import time
+
+import pytest
+
+import organizer.disk_operations as disk_operations
+from organizer.disk_operations import DiskOperations
+from organizer.hash_cache import HashCache
+from organizer.utils import HashAlgorithm
+
+
+def _backdate(*paths, seconds=60):
+    past = time.time() - seconds
+    for path in paths:
+        os.utime(path, (past, past))
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = HashCache(str(tmp_path / "hashes.sqlite3"))
+    yield c
+    c.close()
+
+
+def test_get_returns_hash_for_unchanged_file(tmp_path, cache):
+    path = tmp_path / "file.txt"
+    path.write_text("content")
+    st = os.stat(path)
+
+    assert cache.get(st, HashAlgorithm.XXH3) is None
+    cache.set_many([(st, HashAlgorithm.XXH3, "abc")])
+
+    assert cache.get(os.stat(path), HashAlgorithm.XXH3) == "abc"
+    assert cache.get(os.stat(path), HashAlgorithm.SHA256) is None
+
+
+def test_modified_file_misses(tmp_path, cache):
+    path = tmp_path / "file.txt"
+    path.write_text("content")
+    cache.set_many([(os.stat(path), HashAlgorithm.XXH3, "abc")])
+
+    path.write_text("changed content")
+
+    assert cache.get(os.stat(path), HashAlgorithm.XXH3) is None
+
+
+def test_snapshot_reuses_cached_hashes(tmp_path, cache, monkeypatch):
+    root_dir = tmp_path / "root"
+    root_dir.mkdir()
+    (root_dir / "a.txt").write_text("aaaa")
+    (root_dir / "b.txt").write_text("bbbb")
+    _backdate(root_dir / "a.txt", root_dir / "b.txt")
+
+    first = DiskOperations.create_snapshot(str(root_dir), hash_cache=cache)
+
+    def fail(*args, **kwargs):
+        raise AssertionError("file was rehashed")
+
+    monkeypatch.setattr(disk_operations, "_calculate_short_hash", fail)
+    second = DiskOperations.create_snapshot(str(root_dir), hash_cache=cache)
+
+    assert first == second
+
+
+def test_recently_modified_files_are_not_cached(tmp_path, cache):
+    fresh = tmp_path / "fresh.txt"
+    fresh.write_text("fresh")
+    settled = tmp_path / "settled.txt"
+    settled.write_text("settled")
+    _backdate(settled)
+
+    cache.set_many(
+        [(os.stat(fresh), HashAlgorithm.XXH3, "f"), (os.stat(settled), HashAlgorithm.XXH3, "s")],
+        scan_started_ns=time.time_ns(),
+    )
+
+    assert cache.get(os.stat(fresh), HashAlgorithm.XXH3) is None
+    assert cache.get(os.stat(settled), HashAlgorithm.XXH3) == "s"
+
+
+def test_entries_not_seen_recently_are_pruned_on_open(tmp_path):
+    path = tmp_path / "file.txt"
+    path.write_text("content")
+    cache_path = str(tmp_path / "hashes.sqlite3")
+
+    cache = HashCache(cache_path)
+    cache.set_many([(os.stat(path), HashAlgorithm.XXH3, "abc")])
+    cache.close()
+
+    cache = HashCache(cache_path, max_age_seconds=3600)
+    assert cache.get(os.stat(path), HashAlgorithm.XXH3) == "abc"
+    cache.close()
+
+    cache = HashCache(cache_path, max_age_seconds=-1)
+    assert cache.get(os.stat(path), HashAlgorithm.XXH3) is None
+    cache.close()
+
+
+def test_table_from_older_layout_is_replaced(tmp_path):
+    cache_path = str(tmp_path / "hashes.sqlite3")
+    conn = sqlite3.connect(cache_path)
+    conn.execute("CREATE TABLE hashes (dev INTEGER, ino INTEGER, hash TEXT)")
+    conn.commit()
+    conn.close()
+
+    path = tmp_path / "file.txt"
+    path.write_text("content")
+    cache = HashCache(cache_path)
+    cache.set_many([(os.stat(path), HashAlgorithm.XXH3, "abc")])
+
+    assert cache.get(os.stat(path), HashAlgorithm.XXH3) == "abc"
+    cache.close()
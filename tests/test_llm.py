@@ -0,0 +1,119 @@
+import asyncio
+
+import httpx
+import litellm
+import pytest
+
+import organizer.llm as llm_module
+from organizer.llm import IntelligentFileOrganizer
+from organizer.models import FlatFileItem, LLMResponseSchema, OrganizationStrategy
+
+STRUCTURE = [FlatFileItem(path="a.txt", hash="size-1", size=1)]
+
+
+def _strategy(name: str) -> OrganizationStrategy:
+    return OrganizationStrategy(name=name, items=STRUCTURE)
+
+
+def test_extra_models_are_queried_and_merged(monkeypatch, fake_response):
+    responses = {
+        "a": LLMResponseSchema(strategies=[_strategy("by_type"), _strategy("by_date")]),
+        "b": LLMResponseSchema(strategies=[_strategy("by_type"), _strategy("flat")]),
+    }
+
+    async def fake_acompletion(model, **kwargs):
+        return fake_response(responses[model])
+
+    monkeypatch.setattr(llm_module, "acompletion", fake_acompletion)
+
+    llm = IntelligentFileOrganizer("a", extra_models=["b"])
+    result = llm.generate_reorganization_strategies(STRUCTURE)
+
+    assert [s.name for s in result.strategies] == ["by_type", "by_date", "flat"]
+
+
+def test_failed_extra_model_is_skipped(monkeypatch, fake_response):
+    async def fake_acompletion(model, **kwargs):
+        if model == "b":
+            raise RuntimeError("boom")
+        return fake_response(LLMResponseSchema(strategies=[_strategy("by_type")]))
+
+    monkeypatch.setattr(llm_module, "acompletion", fake_acompletion)
+
+    llm = IntelligentFileOrganizer("a", extra_models=["b"])
+    result = llm.generate_reorganization_strategies(STRUCTURE)
+
+    assert [s.name for s in result.strategies] == ["by_type"]
+
+
+def test_all_models_failing_raises(monkeypatch):
+    async def fake_acompletion(model, **kwargs):
+        raise RuntimeError(f"{model} failed")
+
+    monkeypatch.setattr(llm_module, "acompletion", fake_acompletion)
+
+    llm = IntelligentFileOrganizer("a", extra_models=["b"])
+    with pytest.raises(RuntimeError, match="a failed"):
+        llm.generate_reorganization_strategies(STRUCTURE)
+
+
+def test_concurrent_requests_are_bounded(monkeypatch, fake_response):
+    in_flight = 0
+    peak = 0
+
+    async def fake_acompletion(model, **kwargs):
+        nonlocal in_flight, peak
+        in_flight += 1
+        peak = max(peak, in_flight)
+        await asyncio.sleep(0.01)
+        in_flight -= 1
+        return fake_response(LLMResponseSchema(strategies=[_strategy(model)]))
+
+    monkeypatch.setattr(llm_module, "acompletion", fake_acompletion)
+    monkeypatch.setattr(llm_module, "MAX_CONCURRENT_REQUESTS", 2)
+
+    llm = IntelligentFileOrganizer("m0", extra_models=[f"m{i}" for i in range(1, 6)])
+    result = llm.generate_reorganization_strategies(STRUCTURE)
+
+    assert [s.name for s in result.strategies] == [f"m{i}" for i in range(6)]
+    assert peak == 2
+
+
+@pytest.mark.parametrize(
+    "model, cache_system_prompt, marked",
+    [
+        ("anthropic/claude-sonnet-4", True, True),
+        ("anthropic/claude-sonnet-4", False, False),
+        ("gemini/gemini-2.5-flash", True, False),
+    ],
+)
+def test_system_prompt_cache_hint(monkeypatch, fake_response, model, cache_system_prompt, marked):
+    sent = []
+
+    def fake_completion(messages, **kwargs):
+        sent.append(messages)
+        return fake_response(LLMResponseSchema(strategies=[]))
+
+    monkeypatch.setattr(llm_module, "completion", fake_completion)
+
+    llm = IntelligentFileOrganizer(model, cache_system_prompt=cache_system_prompt)
+    llm.generate_reorganization_strategies(STRUCTURE)
+
+    system_content = sent[0][0]["content"]
+    if marked:
+        assert system_content[0]["cache_control"] == {"type": "ephemeral"}
+        assert system_content[0]["text"] == llm_module.SYSTEM_PROMPT
+    else:
+        assert system_content == llm_module.SYSTEM_PROMPT
+
+
+def test_configure_http_clients_keeps_existing_sessions(monkeypatch):
+    existing = httpx.Client()
+    monkeypatch.setattr(litellm, "client_session", existing)
+    monkeypatch.setattr(litellm, "aclient_session", None)
+
+    llm_module.configure_http_clients()
+
+    assert litellm.client_session is existing
+    assert isinstance(litellm.aclient_session, httpx.AsyncClient)
+    existing.close()
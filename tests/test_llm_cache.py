@@ -0,0 +1,111 @@
+import pytest
+
+import organizer.llm as llm_module
+from organizer.llm import IntelligentFileOrganizer
+from organizer.llm_cache import LLMCache
+from organizer.models import FlatFileItem, LLMResponseSchema
+
+
+@pytest.fixture
+def cache(tmp_path):
+    c = LLMCache(str(tmp_path / "cache.sqlite3"))
+    yield c
+    c.close()
+
+
+def test_get_returns_stored_content(cache):
+    key = LLMCache.make_key("model", [{"role": "user", "content": "hi"}])
+    assert cache.get(key) is None
+
+    cache.set(key, '{"strategies": []}')
+
+    assert cache.get(key) == '{"strategies": []}'
+
+
+def test_key_depends_on_model_and_messages():
+    messages = [{"role": "user", "content": "hi"}]
+    assert LLMCache.make_key("a", messages) == LLMCache.make_key("a", list(messages))
+    assert LLMCache.make_key("a", messages) != LLMCache.make_key("b", messages)
+    assert LLMCache.make_key("a", messages) != LLMCache.make_key(
+        "a", [{"role": "user", "content": "hello"}]
+    )
+    assert LLMCache.make_key("a", messages, {"v": 1}) != LLMCache.make_key(
+        "a", messages, {"v": 2}
+    )
+
+
+def test_expired_entry_is_ignored(tmp_path):
+    cache = LLMCache(str(tmp_path / "cache.sqlite3"), ttl_seconds=-1)
+    cache.set("key", "content")
+
+    assert cache.get("key") is None
+    cache.close()
+
+
+def test_expired_entries_are_pruned_on_open(tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite3")
+    cache = LLMCache(cache_path)
+    cache.set("key", "content")
+    cache.close()
+
+    LLMCache(cache_path, ttl_seconds=-1).close()
+
+    cache = LLMCache(cache_path)
+    assert cache.get("key") is None
+    cache.close()
+
+
+def test_cache_hit_skips_completion(cache, monkeypatch, fake_response):
+    structure = [FlatFileItem(path="a.txt", hash="size-1", size=1)]
+    llm = IntelligentFileOrganizer("test/model", cache=cache)
+    response = LLMResponseSchema(strategies=[])
+
+    calls = []
+
+    def fake_completion(**kwargs):
+        calls.append(kwargs)
+        return fake_response(response)
+
+    monkeypatch.setattr(llm_module, "completion", fake_completion)
+
+    assert llm.generate_reorganization_strategies(structure) == response
+    llm.store_responses()
+    assert llm.generate_reorganization_strategies(structure) == response
+    assert len(calls) == 1
+
+
+def test_rejected_response_is_fetched_again(cache, monkeypatch, fake_response):
+    structure = [FlatFileItem(path="a.txt", hash="size-1", size=1)]
+    llm = IntelligentFileOrganizer("test/model", cache=cache)
+    response = LLMResponseSchema(strategies=[])
+
+    calls = []
+
+    def fake_completion(**kwargs):
+        calls.append(kwargs)
+        return fake_response(response)
+
+    monkeypatch.setattr(llm_module, "completion", fake_completion)
+
+    llm.generate_reorganization_strategies(structure)
+    llm.discard_responses()
+    llm.generate_reorganization_strategies(structure)
+    llm.store_responses()
+    llm.generate_reorganization_strategies(structure)
+    assert len(calls) == 2
+
+
+def test_invalid_cached_response_is_refetched(cache, monkeypatch, fake_response):
+    structure = [FlatFileItem(path="a.txt", hash="size-1", size=1)]
+    llm = IntelligentFileOrganizer("test/model", cache=cache)
+    response = LLMResponseSchema(strategies=[])
+    cache_key = LLMCache.make_key(
+        "test/model", llm._build_messages(structure), llm_module.RESPONSE_FORMAT
+    )
+    cache.set(cache_key, '{"unexpected": true}')
+
+    monkeypatch.setattr(llm_module, "completion", lambda **kwargs: fake_response(response))
+
+    assert llm.generate_reorganization_strategies(structure) == response
+    llm.store_responses()
+    assert cache.get(cache_key) == response.model_dump_json()
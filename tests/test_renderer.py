@@ -88,3 +88,12 @@ def test_trailing_slash_folders(generator):
     ]
     tree = generator.generate_file_tree(items)
     assert tree_to_dict(tree) == {"📁 dir1": {"📁 dir2": None, "📄 file1.txt": None}}
+
+
+def test_folder_equal_to_common_prefix_is_not_nested(generator):
+    items = [
+        FlatFileItem(path="dir1/"),
+        FlatFileItem(path="dir1/file1.txt"),
+    ]
+    tree = generator.generate_file_tree(items)
+    assert tree_to_dict(tree) == {"📁 dir1": {"📄 file1.txt": None}}
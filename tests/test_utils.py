@@ -0,0 +1,49 @@
+import hashlib
+import mmap
+
+import pytest
+
+import organizer.utils as utils
+
+
+@pytest.fixture
+def data_file(tmp_path):
+    path = tmp_path / "data.bin"
+    path.write_bytes(b"organizer" * 1000)
+    return str(path)
+
+
+def test_mapped_and_read_hashes_match(data_file, monkeypatch):
+    read_hash = utils._calculate_short_sha256(data_file)
+
+    monkeypatch.setattr(utils, "MMAP_MIN_SIZE", 1)
+    mapped_hash = utils._calculate_short_sha256(data_file)
+
+    expected = hashlib.sha256(b"organizer" * 1000).hexdigest()[:12]
+    assert read_hash == mapped_hash == expected
+
+
+def test_falls_back_to_reading_when_mmap_fails(data_file, monkeypatch):
+    def fail(*args, **kwargs):
+        raise OSError("mmap not supported")
+
+    monkeypatch.setattr(utils, "MMAP_MIN_SIZE", 1)
+    monkeypatch.setattr(mmap, "mmap", fail)
+
+    assert utils._calculate_md5(data_file) == hashlib.md5(b"organizer" * 1000).hexdigest()
+
+
+def test_reads_in_chunks(data_file, monkeypatch):
+    monkeypatch.setattr(utils, "READ_CHUNK_SIZE", 7)
+
+    assert utils._calculate_md5(data_file) == hashlib.md5(b"organizer" * 1000).hexdigest()
+
+
+def test_read_buffer_is_reused_within_a_thread(tmp_path):
+    path = tmp_path / "small.bin"
+    path.write_bytes(b"abc")
+
+    buffer = utils._read_buffer()
+
+    assert utils._calculate_md5(str(path)) == hashlib.md5(b"abc").hexdigest()
+    assert utils._read_buffer() is buffer